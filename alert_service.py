@@ -3,8 +3,11 @@ Alert Service
 Monitors MegaETH tokens via DexScreener and triggers alerts
 """
 import asyncio
-from typing import List, Dict, Any, Optional, Callable
-from datetime import datetime
+import heapq
+import time
+from typing import List, Dict, Any, Optional, Callable, Set, Tuple
+from contextlib import aclosing
+from operator import attrgetter, itemgetter
 import logging
 
 from config import config
@@ -21,6 +24,39 @@ class AlertType:
     HIGH_VOLUME = "high_volume"
 
 
+_EMOJI_MAP = {
+    AlertType.NEW_PAIR: "🆕",
+    AlertType.PRICE_PUMP: "🚀",
+    AlertType.PRICE_DUMP: "📉",
+    AlertType.HIGH_VOLUME: "📊",
+}
+
+_TITLE_MAP = {alert_type: alert_type.replace('_', ' ').upper() for alert_type in _EMOJI_MAP}
+
+_volume_key = attrgetter("volume_24h")
+_price_change_key = attrgetter("price_change_24h")
+
+
+class RateLimiter:
+    """Spaces out calls so that at most `rate` happen per second"""
+    
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate
+        self._next_slot = 0.0
+    
+    async def acquire(self):
+        """Wait for the next free send slot"""
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+    
+    def pause(self, seconds: float):
+        """Hold back all senders for `seconds`, e.g. after a flood-control error"""
+        self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
 class TokenAlert:
     """Represents an alert to be sent"""
     
@@ -29,63 +65,58 @@ class TokenAlert:
         self.pair = pair
         self.message = message
         self.priority = priority
-        self.timestamp = datetime.now()
+        self.timestamp = time.time()
     
     def format_telegram_message(self) -> str:
         """Format the alert for Telegram"""
-        emoji_map = {
-            AlertType.NEW_PAIR: "🆕",
-            AlertType.PRICE_PUMP: "🚀",
-            AlertType.PRICE_DUMP: "📉",
-            AlertType.HIGH_VOLUME: "📊",
-        }
+        emoji = _EMOJI_MAP.get(self.alert_type, "🔔")
+        title = _TITLE_MAP.get(self.alert_type)
+        if title is None:
+            title = self.alert_type.replace('_', ' ').upper()
         
-        emoji = emoji_map.get(self.alert_type, "🔔")
-        
-        lines = [
-            f"{emoji} *{self.alert_type.replace('_', ' ').upper()}* {emoji}",
-            "",
-            f"*Token:* {self.pair.base_token_name} ({self.pair.base_token_symbol})",
-            f"*Pair:* {self.pair.base_token_symbol}/{self.pair.quote_token_symbol}",
-            f"*DEX:* {self.pair.dex_id}",
-            "",
-            f"💵 *Price:* {self.pair.format_price()}",
-            f"📈 *Volume 24h:* {self.pair.format_volume()}",
-            f"💧 *Liquidity:* {self.pair.format_liquidity()}",
-            f"📊 *Market Cap:* {self.pair.format_market_cap()}",
-        ]
+        pair = self.pair
+        header = (
+            f"{emoji} *{title}* {emoji}\n"
+            "\n"
+            f"*Token:* {pair.base_token_name} ({pair.base_token_symbol})\n"
+            f"*Pair:* {pair.base_token_symbol}/{pair.quote_token_symbol}\n"
+            f"*DEX:* {pair.dex_id}\n"
+            "\n"
+            f"💵 *Price:* {pair.format_price()}\n"
+            f"📈 *Volume 24h:* {pair.format_volume()}\n"
+            f"💧 *Liquidity:* {pair.format_liquidity()}\n"
+            f"📊 *Market Cap:* {pair.format_market_cap()}"
+        )
         
-        if self.pair.price_change_5m is not None:
-            e = "🟢" if self.pair.price_change_5m >= 0 else "🔴"
-            lines.append(f"{e} *5m:* {self.pair.price_change_5m:+.2f}%")
-        if self.pair.price_change_1h is not None:
-            e = "🟢" if self.pair.price_change_1h >= 0 else "🔴"
-            lines.append(f"{e} *1h:* {self.pair.price_change_1h:+.2f}%")
-        if self.pair.price_change_24h is not None:
-            e = "🟢" if self.pair.price_change_24h >= 0 else "🔴"
-            lines.append(f"{e} *24h:* {self.pair.price_change_24h:+.2f}%")
+        optional_lines = []
+        for label, change in (("5m", pair.price_change_5m),
+                              ("1h", pair.price_change_1h),
+                              ("24h", pair.price_change_24h)):
+            if change is not None:
+                e = "🟢" if change >= 0 else "🔴"
+                optional_lines.append(f"{e} *{label}:* {change:+.2f}%")
         
-        total_txns = self.pair.txns_24h_buys + self.pair.txns_24h_sells
+        total_txns = pair.txns_24h_buys + pair.txns_24h_sells
         if total_txns > 0:
-            lines.append(f"🔄 *Txns 24h:* {total_txns} (🟢{self.pair.txns_24h_buys}/🔴{self.pair.txns_24h_sells})")
+            optional_lines.append(f"🔄 *Txns 24h:* {total_txns} (🟢{pair.txns_24h_buys}/🔴{pair.txns_24h_sells})")
         
-        age_minutes = self.pair.get_age_minutes()
+        age_minutes = pair.get_age_minutes()
         if age_minutes is not None:
             if age_minutes < 60:
-                lines.append(f"⏱️ *Age:* {int(age_minutes)} minutes")
+                optional_lines.append(f"⏱️ *Age:* {int(age_minutes)} minutes")
             elif age_minutes < 1440:
-                lines.append(f"⏱️ *Age:* {age_minutes / 60:.1f} hours")
+                optional_lines.append(f"⏱️ *Age:* {age_minutes / 60:.1f} hours")
             else:
-                lines.append(f"⏱️ *Age:* {age_minutes / 1440:.1f} days")
+                optional_lines.append(f"⏱️ *Age:* {age_minutes / 1440:.1f} days")
         
-        lines.extend([
-            "",
-            f"🔗 [View on DexScreener]({self.pair.url})",
-            "",
-            f"📍 *Contract:* `{self.pair.base_token_address[:10]}...{self.pair.base_token_address[-8:]}`"
-        ])
+        footer = (
+            "\n"
+            f"🔗 [View on DexScreener]({pair.url})\n"
+            "\n"
+            f"📍 *Contract:* `{pair.base_token_address[:10]}...{pair.base_token_address[-8:]}`"
+        )
         
-        return "\n".join(lines)
+        return "\n".join((header, *optional_lines, footer))
 
 
 class AlertService:
@@ -98,19 +129,29 @@ class AlertService:
         self.alert_callback = alert_callback
         self._running = False
         self._task: Optional[asyncio.Task] = None
-        self._previous_prices: Dict[str, float] = {}
-        self._previous_volumes: Dict[str, float] = {}
+        # pair_address -> (price_usd, volume_24h) as of the previous poll
+        self._snapshot: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self._seen_addresses: Optional[Set[str]] = None
+        self._alert_queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
+        self._workers: List[asyncio.Task] = []
+        # Shared by every send so the bot stays under Telegram's global message limit
+        self.send_limiter = RateLimiter(config.TELEGRAM_MESSAGES_PER_SECOND)
     
     async def start(self):
         """Start the alert monitoring service"""
         if self._running:
             return
         self._running = True
+        self._workers = [
+            asyncio.create_task(self._send_worker()) for _ in range(config.ALERT_WORKERS)
+        ]
         self._task = asyncio.create_task(self._monitor_loop())
         logger.info("Alert service started")
     
     async def stop(self):
-        """Stop the alert monitoring service"""
+        """Stop the alert monitoring service, giving queued alerts a chance to go out"""
+        if not self._running:
+            return
         self._running = False
         if self._task:
             self._task.cancel()
@@ -118,6 +159,15 @@ class AlertService:
                 await self._task
             except asyncio.CancelledError:
                 pass
+        if self._workers:
+            try:
+                await asyncio.wait_for(self._alert_queue.join(), timeout=config.ALERT_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self._alert_queue.qsize()} queued alerts on shutdown")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
         logger.info("Alert service stopped")
     
     async def _monitor_loop(self):
@@ -129,55 +179,68 @@ class AlertService:
                 logger.error(f"Error in monitor loop: {e}")
             await asyncio.sleep(config.POLL_INTERVAL)
     
+    async def _send_worker(self):
+        """Deliver queued alerts so sends never block polling"""
+        while True:
+            alert, subscriptions = await self._alert_queue.get()
+            try:
+                await self._send_alert(alert, subscriptions)
+            finally:
+                self._alert_queue.task_done()
+    
     async def _check_for_alerts(self):
-        """Check for new tokens and price movements"""
-        pairs = await self.dex_client.get_all_megaeth_pairs()
-        if not pairs:
-            return
-        
-        seen_addresses = await self.db.get_seen_pair_addresses()
+        """Check for new tokens and price movements as pairs stream in"""
         subscriptions = await self.db.get_all_subscriptions()
-        
         if not subscriptions:
             return
         
-        alerts = []
+        if self._seen_addresses is None:
+            self._seen_addresses = await self.db.get_seen_pair_addresses()
+        seen_addresses = self._seen_addresses
         
-        for pair in pairs:
-            if pair.pair_address not in seen_addresses:
-                alert = await self._check_new_pair(pair)
-                if alert:
-                    alerts.append(alert)
-                    await self.db.mark_token_seen(
-                        pair.pair_address, pair.base_token_symbol, pair.base_token_name
-                    )
-            else:
-                price_alert = self._check_price_movement(pair)
-                if price_alert:
-                    alerts.append(price_alert)
-                
-                volume_alert = self._check_volume_spike(pair)
-                if volume_alert:
-                    alerts.append(volume_alert)
-            
-            if pair.price_usd:
-                try:
-                    self._previous_prices[pair.pair_address] = float(pair.price_usd)
-                except ValueError:
-                    pass
-            
-            if pair.volume_24h:
-                self._previous_volumes[pair.pair_address] = pair.volume_24h
+        new_rows = []
+        now = time.time()
         
-        for alert in alerts:
-            await self._send_alert(alert, subscriptions)
+        try:
+            async with aclosing(self.dex_client.iter_all_megaeth_pairs()) as stream:
+                async for pair in stream:
+                    address = pair.pair_address
+                    state = (pair.price_usd, pair.volume_24h)
+                
+                    if address not in seen_addresses:
+                        alert = await self._check_new_pair(pair, now)
+                        if alert:
+                            self._enqueue_alert(alert, subscriptions)
+                            new_rows.append((address, pair.base_token_symbol, pair.base_token_name))
+                    # New pairs may lack liquidity data; movement checks need a tradeable pair
+                    elif pair.is_valid and self._snapshot.get(address) != state:
+                        price_alert = self._check_price_movement(pair)
+                        if price_alert:
+                            self._enqueue_alert(price_alert, subscriptions)
+                
+                        volume_alert = self._check_volume_spike(pair)
+                        if volume_alert:
+                            self._enqueue_alert(volume_alert, subscriptions)
+                
+                    self._snapshot[address] = state
+        finally:
+            # Alerts are already queued, so record their pairs even if the stream fails
+            if new_rows and await self.db.mark_tokens_seen_bulk(new_rows):
+                seen_addresses.update(row[0] for row in new_rows)
     
-    async def _check_new_pair(self, pair: TokenPair) -> Optional[TokenAlert]:
+    def _enqueue_alert(self, alert: TokenAlert, subscriptions: List[Dict[str, Any]]):
+        """Hand an alert to the send workers"""
+        try:
+            self._alert_queue.put_nowait((alert, subscriptions))
+        except asyncio.QueueFull:
+            logger.warning(f"Alert queue full, dropping {alert.alert_type} alert for {alert.pair.base_token_symbol}")
+    
+    async def _check_new_pair(self, pair: TokenPair, now: Optional[float] = None) -> Optional[TokenAlert]:
         """Check if a new pair should trigger an alert"""
         if pair.liquidity_usd and pair.liquidity_usd < config.MIN_LIQUIDITY_USD:
             return None
         
-        age_minutes = pair.get_age_minutes()
+        age_minutes = pair.get_age_minutes(now)
         if age_minutes is not None and age_minutes > config.NEW_PAIR_AGE_MINUTES:
             return None
         
@@ -217,9 +280,10 @@ class AlertService:
         if not pair.volume_24h or pair.volume_24h < config.MIN_VOLUME_USD * 10:
             return None
         
-        previous_volume = self._previous_volumes.get(pair.pair_address)
-        if previous_volume is None:
+        previous = self._snapshot.get(pair.pair_address)
+        if previous is None or previous[1] is None:
             return None
+        previous_volume = previous[1]
         
         if pair.volume_24h >= previous_volume * 2:
             return TokenAlert(
@@ -246,34 +310,33 @@ class AlertService:
     async def get_trending_pairs(self, limit: int = 10) -> List[TokenPair]:
         """Get trending pairs by volume"""
         pairs = await self.dex_client.get_all_megaeth_pairs()
-        pairs_with_volume = [p for p in pairs if p.volume_24h]
-        pairs_with_volume.sort(key=lambda p: p.volume_24h or 0, reverse=True)
-        return pairs_with_volume[:limit]
+        return heapq.nlargest(limit, (p for p in pairs if p.volume_24h), key=_volume_key)
     
     async def get_new_pairs(self, max_age_hours: int = 24) -> List[TokenPair]:
         """Get new pairs within the specified time"""
         pairs = await self.dex_client.get_all_megaeth_pairs()
         max_age_minutes = max_age_hours * 60
+        now = time.time()
         new_pairs = []
         
         for pair in pairs:
-            age = pair.get_age_minutes()
+            age = pair.get_age_minutes(now)
             if age is not None and age <= max_age_minutes:
-                new_pairs.append(pair)
+                new_pairs.append((age, pair))
         
-        new_pairs.sort(key=lambda p: p.get_age_minutes() or float('inf'))
-        return new_pairs
+        new_pairs.sort(key=itemgetter(0))
+        return [pair for _, pair in new_pairs]
     
     async def get_gainers(self, limit: int = 10) -> List[TokenPair]:
         """Get top gainers by price change"""
         pairs = await self.dex_client.get_all_megaeth_pairs()
-        pairs_with_change = [p for p in pairs if p.price_change_24h is not None]
-        pairs_with_change.sort(key=lambda p: p.price_change_24h or 0, reverse=True)
-        return pairs_with_change[:limit]
+        return heapq.nlargest(
+            limit, (p for p in pairs if p.price_change_24h is not None), key=_price_change_key
+        )
     
     async def get_losers(self, limit: int = 10) -> List[TokenPair]:
         """Get top losers by price change"""
         pairs = await self.dex_client.get_all_megaeth_pairs()
-        pairs_with_change = [p for p in pairs if p.price_change_24h is not None]
-        pairs_with_change.sort(key=lambda p: p.price_change_24h or 0)
-        return pairs_with_change[:limit]
+        return heapq.nsmallest(
+            limit, (p for p in pairs if p.price_change_24h is not None), key=_price_change_key
+        )
@@ -22,11 +22,13 @@ from telegram.ext import (
     filters
 )
 from telegram.constants import ParseMode, ChatMemberStatus
+from telegram.error import RetryAfter
 
 from config import config
 from dexscreener_client import DexScreenerClient
 from mogra_client import MograClient
 from database import DatabaseManager
+from http_client import close_shared_connector
 from alert_service import AlertService, TokenAlert
 from portal_service import PortalService, format_portal_setup_message, format_verification_success
 
@@ -69,6 +71,7 @@ class MegaETHBot:
             await self.alert_service.stop()
         await self.dex_client.close()
         await self.mogra_client.close()
+        await close_shared_connector()
         await self.db.close()
         if self._health_server:
             await self._health_server.cleanup()
@@ -105,24 +108,33 @@ class MegaETHBot:
         
         message = alert.format_telegram_message()
         
+        limiter = self.alert_service.send_limiter
         for sub in subscriptions:
             chat_id = sub["chat_id"]
-            try:
-                await self.application.bot.send_message(
-                    chat_id=chat_id,
-                    text=message,
-                    parse_mode=ParseMode.MARKDOWN,
-                    disable_web_page_preview=False
-                )
-                await self.db.log_alert(
-                    telegram_id=sub["telegram_id"],
-                    chat_id=chat_id,
-                    pair_address=alert.pair.pair_address,
-                    alert_type=alert.alert_type,
-                    message=message
-                )
-            except Exception as e:
-                logger.error(f"Failed to send alert to chat {chat_id}: {e}")
+            # One retry if Telegram's flood control asks us to back off
+            for _ in range(2):
+                try:
+                    await limiter.acquire()
+                    await self.application.bot.send_message(
+                        chat_id=chat_id,
+                        text=message,
+                        parse_mode=ParseMode.MARKDOWN,
+                        disable_web_page_preview=False
+                    )
+                    await self.db.log_alert(
+                        telegram_id=sub["telegram_id"],
+                        chat_id=chat_id,
+                        pair_address=alert.pair.pair_address,
+                        alert_type=alert.alert_type,
+                        message=message
+                    )
+                    break
+                except RetryAfter as e:
+                    limiter.pause(e.retry_after)
+                    logger.warning(f"Flood control sending to chat {chat_id}, backing off {e.retry_after}s")
+                except Exception as e:
+                    logger.error(f"Failed to send alert to chat {chat_id}: {e}")
+                    break
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
@@ -1172,6 +1184,8 @@ Select an option below:
             logger.info("Shutting down...")
         finally:
             await self.application.updater.stop()
+            # Drain queued alerts while the bot can still send them
+            await self.alert_service.stop()
             await self.application.stop()
             await self.application.shutdown()
             await self.shutdown()
@@ -15,6 +15,7 @@ class Config:
     # DexScreener API Configuration
     DEXSCREENER_BASE_URL: str = "https://api.dexscreener.com"
     MEGAETH_CHAIN_ID: str = "megaeth"
+    PAIRS_CACHE_TTL: float = float(os.environ.get("PAIRS_CACHE_TTL", "10"))
     
     # Alert Settings
     POLL_INTERVAL: int = int(os.environ.get("POLL_INTERVAL", "30"))
@@ -22,6 +23,12 @@ class Config:
     MIN_LIQUIDITY_USD: float = float(os.environ.get("MIN_LIQUIDITY_USD", "500"))
     PRICE_CHANGE_THRESHOLD: float = float(os.environ.get("PRICE_CHANGE_THRESHOLD", "10.0"))
     NEW_PAIR_AGE_MINUTES: int = int(os.environ.get("NEW_PAIR_AGE_MINUTES", "60"))
+    # Outgoing Telegram messages per second across all alerts (Telegram caps bots at ~30)
+    TELEGRAM_MESSAGES_PER_SECOND: float = float(os.environ.get("TELEGRAM_MESSAGES_PER_SECOND", "25"))
+    # Background alert senders
+    ALERT_WORKERS: int = int(os.environ.get("ALERT_WORKERS", "4"))
+    # Seconds to spend delivering queued alerts on shutdown
+    ALERT_DRAIN_TIMEOUT: float = float(os.environ.get("ALERT_DRAIN_TIMEOUT", "10"))
     
     # Database (SQLite for tracking seen tokens)
     DATABASE_PATH: str = os.environ.get("DATABASE_PATH", "/app/data/megaeth_bot.db")
@@ -5,7 +5,7 @@ Supports Railway persistent storage
 """
 import os
 import asyncio
-from typing import List, Dict, Any, Optional, Set
+from typing import List, Dict, Any, Optional, Set, Tuple
 import logging
 import aiosqlite
 
@@ -20,6 +20,9 @@ class DatabaseManager:
     def __init__(self, db_path: str = None):
         self.db_path = db_path or config.DATABASE_PATH
         self._connection: Optional[aiosqlite.Connection] = None
+        self._subscriptions_cache: Optional[List[Dict[str, Any]]] = None
+        # Bumped on every write that can change the subscription list
+        self._subscriptions_version = 0
         
         # Ensure directory exists for Railway
         db_dir = os.path.dirname(self.db_path)
@@ -175,6 +178,7 @@ class DatabaseManager:
                         updated_at = CURRENT_TIMESTAMP
                 """, (telegram_id, username, mogra_chat_id))
                 await self._connection.commit()
+                self._invalidate_subscriptions()
             return True
         except Exception as e:
             logger.error(f"Error creating/updating user: {e}")
@@ -211,6 +215,7 @@ class DatabaseManager:
                         params
                     )
                     await self._connection.commit()
+                    self._invalidate_subscriptions()
             return True
         except Exception as e:
             logger.error(f"Error updating user settings: {e}")
@@ -225,6 +230,7 @@ class DatabaseManager:
                     VALUES (?, ?, ?)
                 """, (telegram_id, chat_id, subscription_type))
                 await self._connection.commit()
+                self._invalidate_subscriptions()
             return True
         except Exception as e:
             logger.error(f"Error adding subscription: {e}")
@@ -239,13 +245,22 @@ class DatabaseManager:
                     (telegram_id, chat_id)
                 )
                 await self._connection.commit()
+                self._invalidate_subscriptions()
             return True
         except Exception as e:
             logger.error(f"Error removing subscription: {e}")
             return False
     
+    def _invalidate_subscriptions(self):
+        """Drop the cached subscription list after a write"""
+        self._subscriptions_version += 1
+        self._subscriptions_cache = None
+    
     async def get_all_subscriptions(self) -> List[Dict[str, Any]]:
-        """Get all active subscriptions"""
+        """Get all active subscriptions, cached until a user or subscription changes"""
+        if self._subscriptions_cache is not None:
+            return list(self._subscriptions_cache)
+        version = self._subscriptions_version
         async with self._connection.cursor() as cursor:
             await cursor.execute("""
                 SELECT s.*, u.alerts_enabled, u.min_volume_usd, u.min_liquidity_usd, u.price_change_threshold
@@ -255,7 +270,11 @@ class DatabaseManager:
             """)
             rows = await cursor.fetchall()
             columns = [desc[0] for desc in cursor.description]
-            return [dict(zip(columns, row)) for row in rows]
+            subscriptions = [dict(zip(columns, row)) for row in rows]
+            # Only cache if no write landed while the query was in flight
+            if version == self._subscriptions_version:
+                self._subscriptions_cache = subscriptions
+            return list(subscriptions)
     
     async def is_token_seen(self, pair_address: str) -> bool:
         """Check if a token pair has been seen before"""
@@ -264,7 +283,7 @@ class DatabaseManager:
             return await cursor.fetchone() is not None
     
     async def mark_token_seen(self, pair_address: str, token_symbol: str, token_name: str) -> bool:
-        """Mark a token as seen"""
+        """Mark a single token as seen (the alert loop batches via mark_tokens_seen_bulk)"""
         try:
             async with self._connection.cursor() as cursor:
                 await cursor.execute("""
@@ -280,6 +299,25 @@ class DatabaseManager:
             logger.error(f"Error marking token as seen: {e}")
             return False
     
+    async def mark_tokens_seen_bulk(self, rows: List[Tuple[str, str, str]]) -> bool:
+        """Mark many tokens as seen in a single transaction"""
+        if not rows:
+            return True
+        try:
+            async with self._connection.cursor() as cursor:
+                await cursor.executemany("""
+                    INSERT INTO seen_tokens (pair_address, token_symbol, token_name, last_alert_at, alert_count)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP, 1)
+                    ON CONFLICT(pair_address) DO UPDATE SET
+                        last_alert_at = CURRENT_TIMESTAMP,
+                        alert_count = seen_tokens.alert_count + 1
+                """, rows)
+                await self._connection.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error marking tokens as seen: {e}")
+            return False
+    
     async def get_seen_pair_addresses(self) -> Set[str]:
         """Get all seen pair addresses"""
         async with self._connection.cursor() as cursor:
@@ -4,17 +4,119 @@ Fetches token pairs, prices, and trading data from https://dexscreener.com/megae
 """
 import aiohttp
 import asyncio
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
-from datetime import datetime
+import time
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, field
 import logging
 
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
 from config import config
+from http_client import get_shared_connector, json_loads
 
 logger = logging.getLogger(__name__)
 
+# Shared fallback for missing nested objects; never mutated
+_EMPTY: Dict[str, Any] = {}
+
+_MILLION = 1_000_000
+_THOUSAND = 1_000
+
+
+def _format_usd(value: Optional[float]) -> str:
+    """Format a USD amount with an M/K suffix for display"""
+    if not value:
+        return "N/A"
+    if value >= _MILLION:
+        return f"${value / _MILLION:.2f}M"
+    if value >= _THOUSAND:
+        return f"${value / _THOUSAND:.2f}K"
+    return f"${value:.2f}"
+
+
+def _parse_price_usd(raw: Any) -> Optional[float]:
+    """Parse the API's string USD price into a float"""
+    if raw:
+        try:
+            return float(raw)
+        except (ValueError, TypeError):
+            pass
+    return None
+
+
+def _parse_created_at(created_at_ms: Any) -> Optional[float]:
+    """Convert the API's millisecond creation timestamp into epoch seconds"""
+    if created_at_ms:
+        try:
+            return created_at_ms / 1000
+        except TypeError:
+            pass
+    return None
+
+
+if msgspec is not None:
+    class _TokenStruct(msgspec.Struct):
+        address: Optional[str] = None
+        name: Optional[str] = None
+        symbol: Optional[str] = None
+
+    class _TxnCountStruct(msgspec.Struct):
+        buys: Optional[int] = None
+        sells: Optional[int] = None
 
-@dataclass
+    class _TxnsStruct(msgspec.Struct):
+        h24: Optional[_TxnCountStruct] = None
+
+    class _PriceChangeStruct(msgspec.Struct):
+        m5: Optional[float] = None
+        h1: Optional[float] = None
+        h6: Optional[float] = None
+        h24: Optional[float] = None
+
+    class _LiquidityStruct(msgspec.Struct):
+        usd: Optional[float] = None
+
+    class _VolumeStruct(msgspec.Struct):
+        h24: Optional[float] = None
+
+    class _PairStruct(msgspec.Struct, rename="camel"):
+        """A DexScreener pair object, decoded straight from JSON.
+
+        Scalars are nullable so one null field doesn't reject the whole response.
+        """
+        chain_id: Optional[str] = None
+        dex_id: Optional[str] = None
+        pair_address: Optional[str] = None
+        base_token: Optional[_TokenStruct] = None
+        quote_token: Optional[_TokenStruct] = None
+        price_native: Optional[str] = None
+        price_usd: Optional[str] = None
+        volume: Optional[_VolumeStruct] = None
+        liquidity: Optional[_LiquidityStruct] = None
+        fdv: Optional[float] = None
+        market_cap: Optional[float] = None
+        price_change: Optional[_PriceChangeStruct] = None
+        txns: Optional[_TxnsStruct] = None
+        pair_created_at: Optional[float] = None
+        url: Optional[str] = None
+
+    class _SearchStruct(msgspec.Struct):
+        pairs: Optional[List[_PairStruct]] = None
+
+    _EMPTY_TOKEN = _TokenStruct()
+    _EMPTY_TXN_COUNT = _TxnCountStruct()
+    _EMPTY_PRICE_CHANGE = _PriceChangeStruct()
+
+    _search_decoder = msgspec.json.Decoder(_SearchStruct)
+    _pair_list_decoder = msgspec.json.Decoder(List[_PairStruct])
+else:
+    _search_decoder = _pair_list_decoder = None
+
+
+@dataclass(slots=True, frozen=True)
 class TokenPair:
     """Represents a trading pair on MegaETH"""
     chain_id: str
@@ -27,7 +129,7 @@ class TokenPair:
     quote_token_name: str
     quote_token_symbol: str
     price_native: str
-    price_usd: Optional[str]
+    price_usd: Optional[float]
     volume_24h: Optional[float]
     liquidity_usd: Optional[float]
     fdv: Optional[float]
@@ -38,105 +140,121 @@ class TokenPair:
     price_change_24h: Optional[float]
     txns_24h_buys: int
     txns_24h_sells: int
-    pair_created_at: Optional[datetime]
+    pair_created_at: Optional[float]  # epoch seconds
     url: str
+    # Has a USD price and some liquidity; computed once at construction
+    is_valid: bool = field(init=False)
+    
+    def __post_init__(self):
+        object.__setattr__(
+            self, "is_valid", bool(self.price_usd and (self.liquidity_usd or 0) > 0)
+        )
     
     @classmethod
     def from_api_response(cls, data: Dict[str, Any]) -> "TokenPair":
         """Parse API response into TokenPair object"""
-        price_change = data.get("priceChange", {})
-        txns = data.get("txns", {}).get("h24", {})
-        liquidity = data.get("liquidity", {})
-        volume = data.get("volume", {})
+        get = data.get
+        base_token = get("baseToken") or _EMPTY
+        quote_token = get("quoteToken") or _EMPTY
+        price_change = get("priceChange") or _EMPTY
+        txns = (get("txns") or _EMPTY).get("h24") or _EMPTY
+        liquidity = get("liquidity") or _EMPTY
+        volume = get("volume") or _EMPTY
         
-        pair_created_at = None
-        if data.get("pairCreatedAt"):
-            try:
-                pair_created_at = datetime.fromtimestamp(data["pairCreatedAt"] / 1000)
-            except (ValueError, TypeError):
-                pass
+        chain_id = get("chainId", "")
+        pair_address = get("pairAddress", "")
         
         return cls(
-            chain_id=data.get("chainId", ""),
-            dex_id=data.get("dexId", ""),
-            pair_address=data.get("pairAddress", ""),
-            base_token_address=data.get("baseToken", {}).get("address", ""),
-            base_token_name=data.get("baseToken", {}).get("name", ""),
-            base_token_symbol=data.get("baseToken", {}).get("symbol", ""),
-            quote_token_address=data.get("quoteToken", {}).get("address", ""),
-            quote_token_name=data.get("quoteToken", {}).get("name", ""),
-            quote_token_symbol=data.get("quoteToken", {}).get("symbol", ""),
-            price_native=data.get("priceNative", "0"),
-            price_usd=data.get("priceUsd"),
+            chain_id=chain_id,
+            dex_id=get("dexId", ""),
+            pair_address=pair_address,
+            base_token_address=base_token.get("address", ""),
+            base_token_name=base_token.get("name", ""),
+            base_token_symbol=base_token.get("symbol", ""),
+            quote_token_address=quote_token.get("address", ""),
+            quote_token_name=quote_token.get("name", ""),
+            quote_token_symbol=quote_token.get("symbol", ""),
+            price_native=get("priceNative", "0"),
+            price_usd=_parse_price_usd(get("priceUsd")),
             volume_24h=volume.get("h24"),
             liquidity_usd=liquidity.get("usd"),
-            fdv=data.get("fdv"),
-            market_cap=data.get("marketCap"),
+            fdv=get("fdv"),
+            market_cap=get("marketCap"),
             price_change_5m=price_change.get("m5"),
             price_change_1h=price_change.get("h1"),
             price_change_6h=price_change.get("h6"),
             price_change_24h=price_change.get("h24"),
             txns_24h_buys=txns.get("buys", 0),
             txns_24h_sells=txns.get("sells", 0),
-            pair_created_at=pair_created_at,
-            url=data.get("url", f"https://dexscreener.com/{data.get('chainId')}/{data.get('pairAddress')}")
+            pair_created_at=_parse_created_at(get("pairCreatedAt")),
+            url=get("url") or f"https://dexscreener.com/{chain_id}/{pair_address}"
         )
     
-    def get_age_minutes(self) -> Optional[float]:
-        """Get the age of the pair in minutes"""
+    @classmethod
+    def from_struct(cls, data: "_PairStruct") -> "TokenPair":
+        """Build a TokenPair from a msgspec-decoded pair"""
+        base_token = data.base_token or _EMPTY_TOKEN
+        quote_token = data.quote_token or _EMPTY_TOKEN
+        price_change = data.price_change or _EMPTY_PRICE_CHANGE
+        txns = (data.txns and data.txns.h24) or _EMPTY_TXN_COUNT
+        chain_id = data.chain_id or ""
+        pair_address = data.pair_address or ""
+        
+        return cls(
+            chain_id=chain_id,
+            dex_id=data.dex_id or "",
+            pair_address=pair_address,
+            base_token_address=base_token.address or "",
+            base_token_name=base_token.name or "",
+            base_token_symbol=base_token.symbol or "",
+            quote_token_address=quote_token.address or "",
+            quote_token_name=quote_token.name or "",
+            quote_token_symbol=quote_token.symbol or "",
+            price_native=data.price_native or "0",
+            price_usd=_parse_price_usd(data.price_usd),
+            volume_24h=data.volume.h24 if data.volume else None,
+            liquidity_usd=data.liquidity.usd if data.liquidity else None,
+            fdv=data.fdv,
+            market_cap=data.market_cap,
+            price_change_5m=price_change.m5,
+            price_change_1h=price_change.h1,
+            price_change_6h=price_change.h6,
+            price_change_24h=price_change.h24,
+            txns_24h_buys=txns.buys or 0,
+            txns_24h_sells=txns.sells or 0,
+            pair_created_at=_parse_created_at(data.pair_created_at),
+            url=data.url or f"https://dexscreener.com/{chain_id}/{pair_address}"
+        )
+    
+    def get_age_minutes(self, now: Optional[float] = None) -> Optional[float]:
+        """Get the age of the pair in minutes, relative to epoch seconds `now` if given"""
         if self.pair_created_at:
-            delta = datetime.now() - self.pair_created_at
-            return delta.total_seconds() / 60
+            return ((now or time.time()) - self.pair_created_at) / 60
         return None
     
     def format_price(self) -> str:
         """Format price for display"""
-        if self.price_usd:
-            try:
-                price = float(self.price_usd)
-                if price < 0.0001:
-                    return f"${price:.8f}"
-                elif price < 1:
-                    return f"${price:.6f}"
-                else:
-                    return f"${price:.4f}"
-            except ValueError:
-                return self.price_usd
+        price = self.price_usd
+        if price:
+            if price < 0.0001:
+                return f"${price:.8f}"
+            elif price < 1:
+                return f"${price:.6f}"
+            else:
+                return f"${price:.4f}"
         return "N/A"
     
     def format_volume(self) -> str:
         """Format volume for display"""
-        if self.volume_24h:
-            if self.volume_24h >= 1_000_000:
-                return f"${self.volume_24h / 1_000_000:.2f}M"
-            elif self.volume_24h >= 1_000:
-                return f"${self.volume_24h / 1_000:.2f}K"
-            else:
-                return f"${self.volume_24h:.2f}"
-        return "N/A"
+        return _format_usd(self.volume_24h)
     
     def format_liquidity(self) -> str:
         """Format liquidity for display"""
-        if self.liquidity_usd:
-            if self.liquidity_usd >= 1_000_000:
-                return f"${self.liquidity_usd / 1_000_000:.2f}M"
-            elif self.liquidity_usd >= 1_000:
-                return f"${self.liquidity_usd / 1_000:.2f}K"
-            else:
-                return f"${self.liquidity_usd:.2f}"
-        return "N/A"
+        return _format_usd(self.liquidity_usd)
     
     def format_market_cap(self) -> str:
         """Format market cap for display"""
-        mc = self.market_cap or self.fdv
-        if mc:
-            if mc >= 1_000_000:
-                return f"${mc / 1_000_000:.2f}M"
-            elif mc >= 1_000:
-                return f"${mc / 1_000:.2f}K"
-            else:
-                return f"${mc:.2f}"
-        return "N/A"
+        return _format_usd(self.market_cap or self.fdv)
 
 
 class DexScreenerClient:
@@ -146,6 +264,9 @@ class DexScreenerClient:
         self.base_url = config.DEXSCREENER_BASE_URL
         self.chain_id = config.MEGAETH_CHAIN_ID
         self._session: Optional[aiohttp.ClientSession] = None
+        self._pairs_cache: Optional[Tuple[float, List[TokenPair]]] = None
+        self._pairs_cache_ttl = config.PAIRS_CACHE_TTL
+        self._pairs_lock = asyncio.Lock()
     
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get or create aiohttp session"""
@@ -153,7 +274,9 @@ class DexScreenerClient:
             timeout = aiohttp.ClientTimeout(total=30)
             self._session = aiohttp.ClientSession(
                 headers={"Accept": "application/json"},
-                timeout=timeout
+                timeout=timeout,
+                connector=get_shared_connector(),
+                connector_owner=False
             )
         return self._session
     
@@ -162,15 +285,15 @@ class DexScreenerClient:
         if self._session and not self._session.closed:
             await self._session.close()
     
-    async def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
-        """Make HTTP request to DexScreener API"""
+    async def _fetch(self, endpoint: str, params: Optional[Dict] = None) -> Optional[bytes]:
+        """Fetch the raw response body from DexScreener API"""
         session = await self._get_session()
         url = f"{self.base_url}{endpoint}"
         
         try:
             async with session.get(url, params=params) as response:
                 if response.status == 200:
-                    return await response.json()
+                    return await response.read()
                 else:
                     logger.error(f"DexScreener API error: {response.status}")
                     return None
@@ -178,38 +301,103 @@ class DexScreenerClient:
             logger.error(f"HTTP request failed: {e}")
             return None
     
+    def _parse_pairs(self, body: bytes, typed_decoder: Any) -> List[TokenPair]:
+        """Parse a search or pair-list response body into MegaETH pairs"""
+        if typed_decoder is not None:
+            try:
+                decoded = typed_decoder.decode(body)
+            except msgspec.DecodeError as e:
+                # Fall back to the untyped path if the schema drifts
+                logger.warning(f"Typed decode of DexScreener response failed: {e}")
+            else:
+                structs = decoded if isinstance(decoded, list) else decoded.pairs or []
+                return [TokenPair.from_struct(p) for p in structs if p.chain_id == self.chain_id]
+        
+        try:
+            data = json_loads(body)
+        except ValueError as e:
+            logger.error(f"Invalid DexScreener response: {e}")
+            return []
+        if isinstance(data, dict):
+            data = data.get("pairs")
+        if not isinstance(data, list):
+            return []
+        return [
+            TokenPair.from_api_response(p) for p in data if p.get("chainId") == self.chain_id
+        ]
+    
     async def search_pairs(self, query: str) -> List[TokenPair]:
         """Search for pairs matching a query"""
-        data = await self._make_request("/latest/dex/search", {"q": query})
-        if data and "pairs" in data:
-            pairs = []
-            for pair_data in data["pairs"]:
-                if pair_data.get("chainId") == self.chain_id:
-                    pairs.append(TokenPair.from_api_response(pair_data))
-            return pairs
-        return []
+        body = await self._fetch("/latest/dex/search", {"q": query})
+        if body is None:
+            return []
+        return self._parse_pairs(body, _search_decoder)
     
     async def get_token_pairs(self, token_address: str) -> List[TokenPair]:
         """Get all pools for a specific token"""
-        data = await self._make_request(f"/token-pairs/v1/{self.chain_id}/{token_address}")
-        if data and isinstance(data, list):
-            return [TokenPair.from_api_response(p) for p in data]
-        return []
+        body = await self._fetch(f"/token-pairs/v1/{self.chain_id}/{token_address}")
+        if body is None:
+            return []
+        return self._parse_pairs(body, _pair_list_decoder)
+    
+    def _get_cached_pairs(self) -> Optional[List[TokenPair]]:
+        """Return a copy of the cached pair list if it is still fresh"""
+        if self._pairs_cache is not None:
+            fetched_at, cached_pairs = self._pairs_cache
+            if time.monotonic() - fetched_at < self._pairs_cache_ttl:
+                return list(cached_pairs)
+        return None
     
     async def get_all_megaeth_pairs(self) -> List[TokenPair]:
-        """Search for all MegaETH pairs"""
-        all_pairs = []
+        """Search for all MegaETH pairs, served from a short-lived cache"""
+        async with self._pairs_lock:
+            cached = self._get_cached_pairs()
+            if cached is not None:
+                return cached
+            
+            pairs = [pair async for pair in self._stream_megaeth_pairs()]
+            if pairs:
+                self._pairs_cache = (time.monotonic(), pairs)
+            return list(pairs)
+    
+    async def iter_all_megaeth_pairs(self) -> AsyncIterator[TokenPair]:
+        """Yield MegaETH pairs as each search response arrives (consume under contextlib.aclosing)"""
+        # Hold the lock while streaming so concurrent get_all_megaeth_pairs
+        # callers wait for this result instead of searching again
+        async with self._pairs_lock:
+            cached = self._get_cached_pairs()
+            if cached is not None:
+                for pair in cached:
+                    yield pair
+                return
+            
+            pairs = []
+            async for pair in self._stream_megaeth_pairs():
+                pairs.append(pair)
+                yield pair
+            if pairs:
+                self._pairs_cache = (time.monotonic(), pairs)
+    
+    async def _stream_megaeth_pairs(self) -> AsyncIterator[TokenPair]:
+        """Query DexScreener for all MegaETH pairs, yielding deduplicated pairs in arrival order"""
+        seen = set()
         search_queries = ["WETH", "ETH", "USD", "MEGA"]
+        tasks = [asyncio.create_task(self.search_pairs(query)) for query in search_queries]
         
-        for query in search_queries:
-            pairs = await self.search_pairs(query)
-            for pair in pairs:
-                if pair.chain_id == self.chain_id:
-                    if not any(p.pair_address == pair.pair_address for p in all_pairs):
-                        all_pairs.append(pair)
-            await asyncio.sleep(0.2)
-        
-        return all_pairs
-
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                try:
+                    pairs = await next_result
+                except Exception as e:
+                    logger.error(f"Pair search failed: {e}")
+                    continue
+                for pair in pairs:
+                    if pair.chain_id == self.chain_id and pair.pair_address not in seen:
+                        seen.add(pair.pair_address)
+                        yield pair
+        finally:
+            # Don't leave searches running if the consumer stops early
+            for task in tasks:
+                task.cancel()
 
 dex_client = DexScreenerClient()
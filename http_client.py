@@ -0,0 +1,42 @@
+"""
+Shared HTTP Connector
+Single aiohttp connection pool reused by the DexScreener and Mogra clients
+"""
+import aiohttp
+from typing import Any, Optional
+
+try:
+    import orjson
+    
+    def json_loads(data: bytes) -> Any:
+        """Decode a JSON payload"""
+        return orjson.loads(data)
+except ImportError:
+    import json
+    
+    def json_loads(data: bytes) -> Any:
+        """Decode a JSON payload"""
+        return json.loads(data)
+
+_connector: Optional[aiohttp.TCPConnector] = None
+
+
+def get_shared_connector() -> aiohttp.TCPConnector:
+    """Get or create the shared TCP connector (must be called inside the event loop)"""
+    global _connector
+    if _connector is None or _connector.closed:
+        _connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=20,
+            ttl_dns_cache=300,
+            keepalive_timeout=75
+        )
+    return _connector
+
+
+async def close_shared_connector():
+    """Close the shared TCP connector"""
+    global _connector
+    if _connector and not _connector.closed:
+        await _connector.close()
+    _connector = None
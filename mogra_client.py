@@ -9,6 +9,7 @@ from dataclasses import dataclass
 import logging
 
 from config import config
+from http_client import get_shared_connector, json_loads
 
 logger = logging.getLogger(__name__)
 
@@ -65,7 +66,9 @@ class MograClient:
                     "Content-Type": "application/json",
                     "Accept": "application/json"
                 },
-                timeout=timeout
+                timeout=timeout,
+                connector=get_shared_connector(),
+                connector_owner=False
             )
         return self._session
     
@@ -88,7 +91,7 @@ class MograClient:
         try:
             async with session.request(method, url, params=params, json=json_data) as response:
                 if response.status in [200, 201]:
-                    return await response.json()
+                    return json_loads(await response.read())
                 else:
                     error_text = await response.text()
                     logger.error(f"Mogra API error: {response.status} - {error_text}")
@@ -119,8 +122,9 @@ class MograClient:
         return None
     
     async def wait_for_response(self, chat_id: str, timeout: int = 60) -> Optional[str]:
-        """Wait for AI response by polling chat status"""
+        """Wait for AI response by polling chat status with exponential backoff"""
         start_time = asyncio.get_event_loop().time()
+        delay = 0.1
         
         while True:
             elapsed = asyncio.get_event_loop().time() - start_time
@@ -137,7 +141,8 @@ class MograClient:
                         return msg.content
                 return None
             
-            await asyncio.sleep(1)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 2.0)
     
     async def send_and_wait(self, chat_id: str, message: str, timeout: int = 60) -> Optional[str]:
         """Send a message and wait for the AI response"""